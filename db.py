@@ -3,9 +3,21 @@ SQLite database layer for Gmail email metadata storage.
 
 Schema Design Notes:
 - UID is the primary key because Gmail UIDs are stable within a mailbox
+- Only the parsed header fields are stored, never the raw header block
+  (2-4KB per message), so rows stay small and analytics stay cache-resident
 - Message-ID is indexed for deduplication (Gmail shows same email in multiple folders)
-- sender_email is extracted and normalized for analytics queries
-- All text fields use COLLATE NOCASE for case-insensitive matching
+- sender_email is extracted and lowercased at ingest, so it uses plain BINARY
+  collation (cheaper compares, and its indexes match GROUP BY / = lookups)
+- sender_domain (the part after the last '@') is split out at ingest too, so
+  "all mail from x.com" is an index lookup rather than LIKE '%@x.com'
+- Free-text fields (sender_name, subject) use COLLATE NOCASE for matching
+- Tables are STRICT on SQLite >= 3.37 (no per-value type affinity coercion);
+  databases created earlier keep their original schema
+- emails_fts is an external-content FTS5 trigram index over sender_email and
+  subject (SQLite >= 3.34), kept in sync by triggers; substring filters use it
+  to avoid scanning the whole table
+- sender_stats holds per-sender count/size totals, kept in sync by triggers,
+  so "top senders" reads ~distinct-senders rows instead of every email
 
 Gmail IMAP Quirk:
 - The same email appears in multiple "folders" (labels) with the same UID in [Gmail]/All Mail
@@ -13,29 +25,166 @@ Gmail IMAP Quirk:
 - UIDs are only unique per-mailbox, but we only use one mailbox so this is fine
 """
 
+import functools
+import itertools
+import operator
 import sqlite3
+from array import array
 from pathlib import Path
 from typing import Optional
 
 # Default database path
 DEFAULT_DB_PATH = Path(__file__).parent / "gmail.db"
 
+# STRICT tables need SQLite 3.37+; older libraries get the legacy schema
+_TABLE_OPTIONS = " STRICT" if sqlite3.sqlite_version_info >= (3, 37, 0) else ""
 
-def get_connection(db_path: Optional[Path] = None) -> sqlite3.Connection:
-    """Get a database connection with optimal settings for our use case."""
-    path = db_path or DEFAULT_DB_PATH
-    conn = sqlite3.connect(path)
+# Bound parameters per multi-row INSERT: SQLite 3.32+'s default
+# SQLITE_MAX_VARIABLE_NUMBER (lowered further if the library's limit is smaller)
+MAX_INSERT_PARAMS = 32766
+
+# Largest "uid IN (?, ?, ...)" list we build; older SQLite builds cap
+# bound parameters at 999, bigger sets go through a temp table instead
+MAX_IN_CLAUSE_PARAMS = 900
+
+
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    """
+    Tune SQLite for a single-writer, bulk-ingest + analytics workload.
 
+    synchronous=NORMAL is crash-safe under WAL and drops the per-commit
+    fsync; the cache/mmap settings keep analytics queries off the disk.
+    """
     # Enable foreign keys and WAL mode for better concurrent access
     conn.execute("PRAGMA foreign_keys = ON")
     conn.execute("PRAGMA journal_mode = WAL")
 
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -65536")        # 64MB (negative = KiB)
+    conn.execute("PRAGMA mmap_size = 268435456")      # 256MB
+    conn.execute("PRAGMA wal_autocheckpoint = 2000")  # pages
+
+
+def get_connection(db_path: Optional[Path] = None, read_only: bool = False) -> sqlite3.Connection:
+    """
+    Get a database connection with optimal settings for our use case.
+
+    Args:
+        db_path: Database file (defaults to gmail.db next to this module)
+        read_only: Set PRAGMA query_only, for report commands; any write
+            (including TEMP tables) then fails instead of touching the WAL
+    """
+    path = db_path or DEFAULT_DB_PATH
+    conn = sqlite3.connect(path)
+
+    _apply_pragmas(conn)
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
+
     # Return rows as sqlite3.Row for dict-like access
     conn.row_factory = sqlite3.Row
 
     return conn
 
 
+# Secondary indexes on emails, kept separate from the table DDL so a bulk
+# initial sync can drop them and rebuild once at the end
+EMAIL_INDEX_NAMES = (
+    "idx_sender_email", "idx_date_parsed", "idx_size_bytes",
+    "idx_message_id", "idx_sender_size", "idx_sender_domain",
+)
+
+_EMAIL_INDEXES_SQL = """
+    -- Indexes for common analytics queries
+    -- sender_email: "top senders by count"
+    CREATE INDEX IF NOT EXISTS idx_sender_email ON emails(sender_email);
+
+    -- date_parsed: "emails older than X"
+    CREATE INDEX IF NOT EXISTS idx_date_parsed ON emails(date_parsed);
+
+    -- size_bytes: "largest emails"
+    CREATE INDEX IF NOT EXISTS idx_size_bytes ON emails(size_bytes);
+
+    -- message_id: deduplication lookups
+    CREATE INDEX IF NOT EXISTS idx_message_id ON emails(message_id);
+
+    -- Composite index for sender analytics (count + size)
+    CREATE INDEX IF NOT EXISTS idx_sender_size ON emails(sender_email, size_bytes);
+
+    -- sender_domain: per-domain lookups and count + size grouping
+    CREATE INDEX IF NOT EXISTS idx_sender_domain ON emails(sender_domain, size_bytes);
+"""
+
+
+# Trigram FTS5 indexes every 3-character substring, so a MATCH on a quoted
+# term finds the same rows as LIKE '%term%' (SQLite 3.34+)
+FTS_MIN_TERM_LEN = 3
+
+_EMAILS_FTS_SQL = """
+    CREATE VIRTUAL TABLE emails_fts USING fts5(
+        sender_email, subject,
+        content='emails', content_rowid='uid', tokenize='trigram'
+    )
+"""
+
+# Triggers keeping emails_fts in sync; dropped with the indexes for a bulk load
+EMAIL_FTS_TRIGGER_NAMES = ("emails_fts_ai", "emails_fts_ad", "emails_fts_au")
+
+_EMAILS_FTS_TRIGGERS_SQL = """
+    CREATE TRIGGER IF NOT EXISTS emails_fts_ai AFTER INSERT ON emails BEGIN
+        INSERT INTO emails_fts (rowid, sender_email, subject)
+        VALUES (new.uid, new.sender_email, new.subject);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS emails_fts_ad AFTER DELETE ON emails BEGIN
+        INSERT INTO emails_fts (emails_fts, rowid, sender_email, subject)
+        VALUES ('delete', old.uid, old.sender_email, old.subject);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS emails_fts_au AFTER UPDATE OF sender_email, subject ON emails BEGIN
+        INSERT INTO emails_fts (emails_fts, rowid, sender_email, subject)
+        VALUES ('delete', old.uid, old.sender_email, old.subject);
+        INSERT INTO emails_fts (rowid, sender_email, subject)
+        VALUES (new.uid, new.sender_email, new.subject);
+    END;
+"""
+
+
+# Triggers keeping sender_stats in sync; dropped with the indexes for a bulk load
+SENDER_STATS_TRIGGER_NAMES = ("sender_stats_ai", "sender_stats_ad", "sender_stats_au")
+
+_SENDER_STATS_TRIGGERS_SQL = """
+    CREATE TRIGGER IF NOT EXISTS sender_stats_ai AFTER INSERT ON emails
+    WHEN new.sender_email != '' BEGIN
+        INSERT INTO sender_stats (sender_email, count, total_size)
+        VALUES (new.sender_email, 1, COALESCE(new.size_bytes, 0))
+        ON CONFLICT (sender_email) DO UPDATE
+        SET count = count + 1, total_size = total_size + excluded.total_size;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sender_stats_ad AFTER DELETE ON emails
+    WHEN old.sender_email != '' BEGIN
+        UPDATE sender_stats
+        SET count = count - 1, total_size = total_size - COALESCE(old.size_bytes, 0)
+        WHERE sender_email = old.sender_email;
+        DELETE FROM sender_stats WHERE sender_email = old.sender_email AND count <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sender_stats_au AFTER UPDATE OF sender_email, size_bytes ON emails
+    BEGIN
+        UPDATE sender_stats
+        SET count = count - 1, total_size = total_size - COALESCE(old.size_bytes, 0)
+        WHERE sender_email = old.sender_email AND old.sender_email != '';
+        DELETE FROM sender_stats WHERE sender_email = old.sender_email AND count <= 0;
+        INSERT INTO sender_stats (sender_email, count, total_size)
+        SELECT new.sender_email, 1, COALESCE(new.size_bytes, 0) WHERE new.sender_email != ''
+        ON CONFLICT (sender_email) DO UPDATE
+        SET count = count + 1, total_size = total_size + excluded.total_size;
+    END;
+"""
+
+
 def init_db(db_path: Optional[Path] = None) -> None:
     """
     Initialize the database schema.
@@ -44,14 +193,15 @@ def init_db(db_path: Optional[Path] = None) -> None:
     """
     conn = get_connection(db_path)
 
-    conn.executescript("""
+    conn.executescript(f"""
         -- Main emails table
         -- UID is primary key: stable identifier within Gmail's All Mail
         CREATE TABLE IF NOT EXISTS emails (
             uid             INTEGER PRIMARY KEY,  -- IMAP UID from [Gmail]/All Mail
             message_id      TEXT,                 -- RFC Message-ID header (for dedup reference)
             sender_raw      TEXT,                 -- Full From header as-is
-            sender_email    TEXT COLLATE NOCASE,  -- Extracted email address, lowercased
+            sender_email    TEXT,                 -- Extracted email address, lowercased
+            sender_domain   TEXT,                 -- Domain part of sender_email
             sender_name     TEXT COLLATE NOCASE,  -- Extracted display name
             recipient_raw   TEXT,                 -- Full To header as-is
             subject         TEXT COLLATE NOCASE,  -- Subject line
@@ -59,31 +209,17 @@ def init_db(db_path: Optional[Path] = None) -> None:
             date_parsed     TEXT,                 -- ISO8601 parsed date (for sorting)
             size_bytes      INTEGER,              -- RFC822.SIZE
             fetched_at      TEXT DEFAULT (datetime('now'))  -- When we fetched this
-        );
-
-        -- Indexes for common analytics queries
-        -- sender_email: "top senders by count"
-        CREATE INDEX IF NOT EXISTS idx_sender_email ON emails(sender_email);
-
-        -- date_parsed: "emails older than X"
-        CREATE INDEX IF NOT EXISTS idx_date_parsed ON emails(date_parsed);
-
-        -- size_bytes: "largest emails"
-        CREATE INDEX IF NOT EXISTS idx_size_bytes ON emails(size_bytes);
-
-        -- message_id: deduplication lookups
-        CREATE INDEX IF NOT EXISTS idx_message_id ON emails(message_id);
-
-        -- Composite index for sender analytics (count + size)
-        CREATE INDEX IF NOT EXISTS idx_sender_size ON emails(sender_email, size_bytes);
+        ){_TABLE_OPTIONS};
 
         -- Track sync state to enable incremental fetches
         CREATE TABLE IF NOT EXISTS sync_state (
             id              INTEGER PRIMARY KEY CHECK (id = 1),  -- Singleton row
             last_uid        INTEGER,              -- Highest UID we've fetched
             last_sync       TEXT,                 -- Timestamp of last sync
-            total_messages  INTEGER               -- UIDNEXT or message count at last sync
-        );
+            total_messages  INTEGER,              -- UIDNEXT or message count at last sync
+            uidvalidity     INTEGER,              -- Mailbox UIDVALIDITY at last sync
+            highest_modseq  INTEGER               -- HIGHESTMODSEQ at last sync (QRESYNC)
+        ){_TABLE_OPTIONS};
 
         -- Initialize sync state if not present
         INSERT OR IGNORE INTO sync_state (id, last_uid, last_sync, total_messages)
@@ -94,16 +230,209 @@ def init_db(db_path: Optional[Path] = None) -> None:
         CREATE TABLE IF NOT EXISTS deleted_uids (
             uid             INTEGER PRIMARY KEY,
             deleted_at      TEXT DEFAULT (datetime('now'))
-        );
+        ){_TABLE_OPTIONS};
+
+        -- Per-sender totals over emails (non-empty sender_email only),
+        -- maintained by the sender_stats_* triggers
+        CREATE TABLE IF NOT EXISTS sender_stats (
+            sender_email    TEXT PRIMARY KEY,
+            count           INTEGER NOT NULL,
+            total_size      INTEGER NOT NULL      -- SUM(size_bytes)
+        ){_TABLE_OPTIONS};
+    """)
+
+    # Databases created before these columns existed (before the indexes,
+    # which may cover them)
+    _add_missing_columns(conn, "emails", {"sender_domain": "TEXT"})
+    _add_missing_columns(conn, "sync_state", {
+        "uidvalidity": "INTEGER",
+        "highest_modseq": "INTEGER",
+    })
+
+    conn.executescript(_EMAIL_INDEXES_SQL)
+
+    # Backfill sender_domain for rows stored before the column existed
+    conn.create_function("email_domain", 1, email_domain, deterministic=True)
+    conn.execute("""
+        UPDATE emails SET sender_domain = email_domain(sender_email)
+        WHERE sender_domain IS NULL AND sender_email IS NOT NULL
     """)
+    conn.commit()
+
+    if not has_emails_fts(conn):
+        try:
+            conn.execute(_EMAILS_FTS_SQL)
+        except sqlite3.OperationalError:
+            # No FTS5 or no trigram tokenizer: substring filters stay LIKE scans
+            pass
+    _create_fts_triggers(conn)
+    _create_sender_stats_triggers(conn)
 
     conn.commit()
     conn.close()
 
 
+def email_domain(address: Optional[str]) -> str:
+    """Domain part of an email address (after the last '@'); "" if there is none."""
+    if not address:
+        return ""
+    _, at, domain = address.rpartition("@")
+    return domain if at else ""
+
+
+def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> None:
+    """ALTER TABLE ADD COLUMN for each name -> type in `columns` not yet in `table`."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, col_type in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+
+
+def has_emails_fts(conn: sqlite3.Connection) -> bool:
+    """True if the emails_fts index exists in this database."""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def _create_fts_triggers(conn: sqlite3.Connection) -> None:
+    """
+    Create the emails_fts sync triggers if they are missing.
+
+    Rows written while the triggers were absent (a freshly added index, or a
+    bulk load) are picked up by rebuilding emails_fts from the emails table.
+    """
+    if not has_emails_fts(conn):
+        return
+
+    existing = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'emails'"
+    )}
+    if existing.issuperset(EMAIL_FTS_TRIGGER_NAMES):
+        return
+
+    conn.executescript(_EMAILS_FTS_TRIGGERS_SQL)
+    conn.execute("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')")
+    conn.commit()
+
+
+def has_sender_stats(conn: sqlite3.Connection) -> bool:
+    """True if sender_stats is being maintained (all its triggers exist)."""
+    existing = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'emails'"
+    )}
+    return existing.issuperset(SENDER_STATS_TRIGGER_NAMES)
+
+
+def _create_sender_stats_triggers(conn: sqlite3.Connection) -> None:
+    """
+    Create the sender_stats triggers if they are missing.
+
+    sender_stats is recomputed from emails first, since any rows written
+    while the triggers were absent are not reflected in it.
+    """
+    if has_sender_stats(conn):
+        return
+
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    conn.execute("DELETE FROM sender_stats")
+    conn.execute("""
+        INSERT INTO sender_stats (sender_email, count, total_size)
+        SELECT sender_email, COUNT(*), COALESCE(SUM(size_bytes), 0)
+        FROM emails
+        WHERE sender_email != ''
+        GROUP BY sender_email
+    """)
+    # executescript() commits the rebuild before creating the triggers
+    conn.executescript(_SENDER_STATS_TRIGGERS_SQL)
+
+
+def sender_like_clause(conn: sqlite3.Connection, like_patterns: list[str]) -> tuple[str, list]:
+    """
+    Build a WHERE clause for "sender_email LIKE any of `like_patterns`".
+
+    When emails_fts is available and every pattern is a plain term wrapped in
+    '%' (no inner wildcards, at least FTS_MIN_TERM_LEN characters), an FTS5
+    MATCH narrows the candidate rows first; the LIKEs are still applied to
+    those rows, so the result is exactly what the plain LIKE scan returns.
+
+    Args:
+        conn: Database connection
+        like_patterns: LIKE patterns, e.g. ["%noreply%", "info@%"]
+
+    Returns:
+        (sql, params) to splice into "WHERE {sql}"
+    """
+    conditions = "(" + " OR ".join("sender_email LIKE ?" for _ in like_patterns) + ")"
+    params = list(like_patterns)
+
+    terms = [p.strip("%") for p in like_patterns]
+    if not has_emails_fts(conn) or not all(
+        len(t) >= FTS_MIN_TERM_LEN and "%" not in t and "_" not in t for t in terms
+    ):
+        return conditions, params
+
+    match = " OR ".join('sender_email : "' + t.replace('"', '""') + '"' for t in terms)
+    sql = f"uid IN (SELECT rowid FROM emails_fts WHERE emails_fts MATCH ?) AND {conditions}"
+    return sql, [match] + params
+
+
+def drop_email_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Drop the secondary indexes on emails (the UID primary key stays).
+
+    Used around a bulk initial sync: one CREATE INDEX pass over the loaded
+    table is much cheaper than maintaining every B-tree on each insert.
+    Call create_email_indexes() afterwards. The emails_fts and sender_stats
+    triggers are dropped too; both are rebuilt in one pass when they return.
+    """
+    for name in EMAIL_INDEX_NAMES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for name in EMAIL_FTS_TRIGGER_NAMES + SENDER_STATS_TRIGGER_NAMES:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.commit()
+
+
+def create_email_indexes(conn: sqlite3.Connection) -> None:
+    """(Re)create the secondary indexes and sync triggers. No-op if they exist."""
+    conn.executescript(_EMAIL_INDEXES_SQL)
+    _create_fts_triggers(conn)
+    _create_sender_stats_triggers(conn)
+
+
+# Columns written on insert, in bind order
+EMAIL_COLUMNS = (
+    "uid", "message_id", "sender_raw", "sender_email", "sender_domain", "sender_name",
+    "recipient_raw", "subject", "date_header", "date_parsed", "size_bytes",
+)
+
+# Email dict -> positional row tuple (cheaper to bind than named params)
+as_email_row = operator.itemgetter(*EMAIL_COLUMNS)
+
+# Only a duplicate UID is skipped; any other constraint failure still raises
+_INSERT_EMAIL_SQL = f"""
+    INSERT INTO emails ({", ".join(EMAIL_COLUMNS)})
+    VALUES ({", ".join("?" * len(EMAIL_COLUMNS))})
+    ON CONFLICT (uid) DO NOTHING
+"""
+
+
+@functools.lru_cache(maxsize=16)
+def _insert_emails_sql(row_count: int) -> str:
+    """Multi-row form of _INSERT_EMAIL_SQL for `row_count` rows."""
+    row = f"({', '.join('?' * len(EMAIL_COLUMNS))})"
+    return f"""
+        INSERT INTO emails ({", ".join(EMAIL_COLUMNS)})
+        VALUES {", ".join([row] * row_count)}
+        ON CONFLICT (uid) DO NOTHING
+    """
+
+
 def insert_email(conn: sqlite3.Connection, email_data: dict) -> bool:
     """
-    Insert an email record. Uses INSERT OR IGNORE to handle duplicates.
+    Insert an email record. Uses ON CONFLICT DO NOTHING to handle duplicates.
 
     Args:
         conn: Database connection
@@ -112,47 +441,118 @@ def insert_email(conn: sqlite3.Connection, email_data: dict) -> bool:
     Returns:
         True if inserted, False if already existed (duplicate UID)
     """
-    cursor = conn.execute("""
-        INSERT OR IGNORE INTO emails (
-            uid, message_id, sender_raw, sender_email, sender_name,
-            recipient_raw, subject, date_header, date_parsed, size_bytes
-        ) VALUES (
-            :uid, :message_id, :sender_raw, :sender_email, :sender_name,
-            :recipient_raw, :subject, :date_header, :date_parsed, :size_bytes
-        )
-    """, email_data)
+    cursor = conn.execute(_INSERT_EMAIL_SQL, as_email_row(email_data))
 
     return cursor.rowcount > 0
 
 
-def insert_emails_batch(conn: sqlite3.Connection, emails: list[dict]) -> int:
+def insert_emails_batch(
+    conn: sqlite3.Connection,
+    emails: list[dict],
+    commit: bool = True
+) -> int:
     """
     Insert multiple emails in a single transaction.
 
+    Rows go in as multi-row "INSERT ... VALUES (...), (...), ..." statements
+    (one VDBE program per chunk rather than per row) inside BEGIN IMMEDIATE
+    ... COMMIT - per-row round-trips dominate ingest time on large mailboxes.
+
+    Args:
+        conn: Database connection
+        emails: Dicts with keys matching column names
+        commit: If False, leave the transaction open so the caller can
+            group several batches into one commit
+
     Returns:
         Number of new emails inserted (excludes duplicates)
     """
+    return insert_email_rows(conn, [as_email_row(email) for email in emails], commit)
+
+
+def insert_email_rows(
+    conn: sqlite3.Connection,
+    rows: list[tuple],
+    commit: bool = True
+) -> int:
+    """
+    insert_emails_batch() for rows already laid out in EMAIL_COLUMNS order
+    (see as_email_row()).
+    """
+    if not rows:
+        return 0
+
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+    # Fill each statement up to the bound-parameter limit
+    max_params = min(conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER), MAX_INSERT_PARAMS)
+    rows_per_statement = max(1, max_params // len(EMAIL_COLUMNS))
+
+    # rowcount excludes skipped duplicates (and, unlike total_changes,
+    # any writes made by triggers)
     inserted = 0
-    for email_data in emails:
-        if insert_email(conn, email_data):
-            inserted += 1
-    conn.commit()
+    for i in range(0, len(rows), rows_per_statement):
+        chunk = rows[i:i + rows_per_statement]
+        params = list(itertools.chain.from_iterable(chunk))
+        inserted += conn.execute(_insert_emails_sql(len(chunk)), params).rowcount
+
+    if commit:
+        conn.commit()
     return inserted
 
 
 def get_sync_state(conn: sqlite3.Connection) -> dict:
     """Get the current sync state."""
     row = conn.execute("SELECT * FROM sync_state WHERE id = 1").fetchone()
-    return dict(row) if row else {"last_uid": 0, "last_sync": None, "total_messages": 0}
+    return dict(row) if row else {
+        "last_uid": 0, "last_sync": None, "total_messages": 0,
+        "uidvalidity": None, "highest_modseq": None,
+    }
+
+
+def update_sync_state(
+    conn: sqlite3.Connection,
+    last_uid: int,
+    total_messages: int,
+    uidvalidity: Optional[int] = None,
+    highest_modseq: Optional[int] = None
+) -> None:
+    """
+    Update sync state after a fetch operation.
+
+    uidvalidity/highest_modseq are kept for QRESYNC-capable servers;
+    None leaves the stored values as they are.
+    """
+    conn.execute("""
+        UPDATE sync_state
+        SET last_uid = ?, last_sync = datetime('now'), total_messages = ?,
+            uidvalidity = COALESCE(?, uidvalidity),
+            highest_modseq = COALESCE(?, highest_modseq)
+        WHERE id = 1
+    """, (last_uid, total_messages, uidvalidity, highest_modseq))
+    conn.commit()
 
 
-def update_sync_state(conn: sqlite3.Connection, last_uid: int, total_messages: int) -> None:
-    """Update sync state after a fetch operation."""
+def reset_mailbox(conn: sqlite3.Connection) -> None:
+    """
+    Forget everything stored for the mailbox: emails, tombstones, sync state.
+
+    Needed when the server's UIDVALIDITY changes - every stored UID then
+    refers to nothing (or to a different message), so the next sync has
+    to start from scratch.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+
+    conn.execute("DELETE FROM emails")
+    conn.execute("DELETE FROM deleted_uids")
     conn.execute("""
         UPDATE sync_state
-        SET last_uid = ?, last_sync = datetime('now'), total_messages = ?
+        SET last_uid = 0, total_messages = 0, uidvalidity = NULL, highest_modseq = NULL
         WHERE id = 1
-    """, (last_uid, total_messages))
+    """)
+
     conn.commit()
 
 
@@ -161,30 +561,88 @@ def mark_deleted(conn: sqlite3.Connection, uids: list[int]) -> None:
     Mark UIDs as deleted (after successful IMAP deletion).
 
     This removes them from the emails table and adds them to deleted_uids
-    so we don't try to re-fetch them.
+    so we don't try to re-fetch them. Both steps run in one transaction,
+    and the DELETE is a single statement: an IN list for small batches,
+    a temp-table join above SQLite's bound-parameter limit.
     """
+    if not uids:
+        return
+
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+
     conn.executemany(
         "INSERT OR IGNORE INTO deleted_uids (uid) VALUES (?)",
-        [(uid,) for uid in uids]
+        ((uid,) for uid in uids)
     )
+
+    if len(uids) <= MAX_IN_CLAUSE_PARAMS:
+        placeholders = ",".join("?" * len(uids))
+        conn.execute(f"DELETE FROM emails WHERE uid IN ({placeholders})", list(uids))
+    else:
+        load_temp_uids(conn, "_tdel", uids)
+        conn.execute("DELETE FROM emails WHERE uid IN (SELECT uid FROM _tdel)")
+        conn.execute("DROP TABLE _tdel")
+
+    conn.commit()
+
+
+def load_temp_uids(conn: sqlite3.Connection, table: str, uids) -> None:
+    """
+    (Re)create TEMP table `table`(uid INTEGER PRIMARY KEY) holding `uids`.
+
+    Joining against this instead of building "uid IN (?, ?, ...)" keeps one
+    query plan for any number of UIDs and avoids the bound-parameter limit.
+    Caller drops the table when done.
+    """
+    conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+    conn.execute(f"CREATE TEMP TABLE {table} (uid INTEGER PRIMARY KEY)")
     conn.executemany(
-        "DELETE FROM emails WHERE uid = ?",
-        [(uid,) for uid in uids]
+        f"INSERT OR IGNORE INTO {table} (uid) VALUES (?)",
+        ((uid,) for uid in uids)
     )
+
+
+def filter_new_uids(conn: sqlite3.Connection, uids) -> tuple[array, int]:
+    """
+    Drop UIDs that are already stored or were previously deleted from
+    `uids`.
+
+    Done as an anti-join in SQLite against the emails and deleted_uids
+    primary keys, so a sync restarted after a crash doesn't re-FETCH
+    headers it has already stored and the tombstones are never
+    materialized as a Python set. The result is held for the whole fetch,
+    so it streams into a compact array rather than a list of rows.
+
+    Returns:
+        Tuple of (remaining UIDs sorted ascending as an array('q'),
+        number of UIDs dropped because they were previously deleted)
+    """
+    load_temp_uids(conn, "_cand", uids)
+    deleted_count = conn.execute("""
+        SELECT COUNT(*)
+        FROM _cand c
+        JOIN deleted_uids d USING (uid)
+    """).fetchone()[0]
+    cursor = conn.execute("""
+        SELECT c.uid
+        FROM _cand c
+        WHERE NOT EXISTS (SELECT 1 FROM emails e WHERE e.uid = c.uid)
+          AND NOT EXISTS (SELECT 1 FROM deleted_uids d WHERE d.uid = c.uid)
+        ORDER BY c.uid
+    """)
+    result = array("q", (row[0] for row in cursor))
+    conn.execute("DROP TABLE _cand")
     conn.commit()
 
+    return result, deleted_count
+
 
 def get_email_count(conn: sqlite3.Connection) -> int:
     """Get total number of stored emails."""
     return conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
 
 
-def get_deleted_uids(conn: sqlite3.Connection) -> set[int]:
-    """Get set of UIDs we've previously deleted."""
-    rows = conn.execute("SELECT uid FROM deleted_uids").fetchall()
-    return {row[0] for row in rows}
-
-
 if __name__ == "__main__":
     # Quick test: initialize DB and print schema
     init_db()
@@ -17,12 +17,13 @@ This module:
 - Updates local SQLite database after deletion
 """
 
+import re
 import sys
 import time
-from typing import TextIO
+from typing import BinaryIO, TextIO, Union
 
-from imap_client import GmailIMAPClient, load_config_from_env
-from db import get_connection, mark_deleted, get_connection
+from imap_client import pooled_client, load_config_from_env
+from db import get_connection, mark_deleted, load_temp_uids
 
 # Safety: batch size for deletion (smaller = safer, slower)
 DELETE_BATCH_SIZE = 50
@@ -30,34 +31,67 @@ DELETE_BATCH_SIZE = 50
 # Delay between deletion batches (seconds)
 DELETE_BATCH_DELAY = 1.0
 
+# UID stream parsing (see read_uids_from_stream)
+_COMMENT_LINE_RE = re.compile(rb"(?m)^[ \t]*#.*$")
+_UID_LIST_RE = re.compile(rb"[\d\s,]*")
+_UID_RE = re.compile(rb"\d+")
 
-def read_uids_from_stream(stream: TextIO) -> list[int]:
+# Dry-run previews list each email only up to this many matches
+PREVIEW_DETAIL_LIMIT = 200
+
+# Below this many UIDs, importing numpy costs more than set() dedup saves
+NUMPY_DEDUP_THRESHOLD = 100_000
+
+
+def read_uids_from_stream(stream: Union[TextIO, BinaryIO]) -> list[int]:
     """
-    Read UIDs from a text stream (stdin or file).
+    Read UIDs from a text or binary stream (stdin or file).
 
     Expected format: one UID per line, or comma-separated.
     Ignores empty lines and lines starting with #.
+
+    The whole stream is read at once and tokenized by the regex engine,
+    which matters when piping hundreds of thousands of UIDs from sqlite3.
     """
+    data = stream.read()
+    if isinstance(data, str):
+        data = data.encode()
+
+    # Drop comment lines (leading whitespace allowed, as before)
+    data = _COMMENT_LINE_RE.sub(b"", data)
+
+    # Fast path: nothing but digits and separators
+    if _UID_LIST_RE.fullmatch(data):
+        return list(map(int, _UID_RE.findall(data)))
+
+    # Slow path: warn about each bad token
     uids = []
+    for part in data.replace(b",", b" ").split():
+        try:
+            uids.append(int(part))
+        except ValueError:
+            print(f"Warning: ignoring non-integer value: {part.decode(errors='replace')}", file=sys.stderr)
 
-    for line in stream:
-        line = line.strip()
+    return uids
 
-        # Skip empty lines and comments
-        if not line or line.startswith("#"):
-            continue
 
-        # Handle comma-separated values on a line
-        parts = line.replace(",", " ").split()
+def dedupe_uids(uids: list[int]) -> list[int]:
+    """
+    Sort and deduplicate UIDs.
 
-        for part in parts:
-            try:
-                uid = int(part)
-                uids.append(uid)
-            except ValueError:
-                print(f"Warning: ignoring non-integer value: {part}", file=sys.stderr)
+    Huge lists (e.g. every UID piped from a query) go through numpy when it
+    is installed: one contiguous int64 buffer and a C-level unique, instead
+    of a set of boxed Python ints.
+    """
+    if len(uids) >= NUMPY_DEDUP_THRESHOLD:
+        try:
+            import numpy as np
+        except ImportError:
+            pass  # Optional dependency - fall back to set()
+        else:
+            return np.unique(np.fromiter(uids, dtype=np.int64, count=len(uids))).tolist()
 
-    return uids
+    return sorted(set(uids))
 
 
 def preview_deletion(uids: list[int]) -> None:
@@ -72,28 +106,33 @@ def preview_deletion(uids: list[int]) -> None:
 
     conn = get_connection()
 
-    # Query emails from database
-    placeholders = ",".join("?" * len(uids))
-    cursor = conn.execute(f"""
-        SELECT uid, sender_email, subject, date_parsed, size_bytes
-        FROM emails
-        WHERE uid IN ({placeholders})
-        ORDER BY date_parsed DESC
-    """, uids)
+    # Query emails from database via a temp-table join (no placeholder limit)
+    load_temp_uids(conn, "_pv", uids)
+
+    # Let SQLite do the summary math in one aggregate pass
+    found_count, total_size = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(e.size_bytes), 0)
+        FROM emails e
+        JOIN _pv USING (uid)
+    """).fetchone()
 
-    rows = cursor.fetchall()
+    show_details = found_count <= PREVIEW_DETAIL_LIMIT
+    rows = []
+    if show_details:
+        rows = conn.execute("""
+            SELECT e.uid, e.sender_email, e.subject, e.date_parsed, e.size_bytes
+            FROM emails e
+            JOIN _pv USING (uid)
+            ORDER BY e.date_parsed DESC
+        """).fetchall()
+
+    conn.execute("DROP TABLE _pv")
 
     print(f"\n{'='*60}")
     print(f"DRY RUN: Would delete {len(uids)} emails")
     print(f"{'='*60}\n")
 
-    total_size = 0
-    found_count = 0
-
     for row in rows:
-        found_count += 1
-        total_size += row["size_bytes"] or 0
-
         subject = (row["subject"] or "")[:50]
         size_kb = (row["size_bytes"] or 0) / 1024
 
@@ -102,6 +141,9 @@ def preview_deletion(uids: list[int]) -> None:
         print(f"             Date: {row['date_parsed']} | Size: {size_kb:.1f} KB")
         print()
 
+    if not show_details:
+        print(f"(Per-email details skipped: more than {PREVIEW_DETAIL_LIMIT} matches)\n")
+
     not_found = len(uids) - found_count
 
     print(f"{'='*60}")
@@ -147,7 +189,8 @@ def delete_emails(
     config = load_config_from_env()
     conn = get_connection()
 
-    with GmailIMAPClient(config) as client:
+    # One read-write SELECT for the whole run rather than two per batch
+    with pooled_client(config) as client, client.read_write():
         total = len(uids)
 
         for i in range(0, total, batch_size):
@@ -250,7 +293,7 @@ Examples:
         all_uids.extend(read_uids_from_stream(sys.stdin))
 
     # Deduplicate
-    all_uids = sorted(set(all_uids))
+    all_uids = dedupe_uids(all_uids)
 
     if not all_uids:
         print("No UIDs provided. Use --help for usage.", file=sys.stderr)
@@ -11,13 +11,34 @@ Usage:
     python main.py stats           # Show overview statistics
     python main.py query "SQL"     # Run ad-hoc SQL query
     python main.py top-senders     # Show top senders
+    python main.py top-senders --csv > senders.csv   # Machine-readable output
     python main.py sample          # Fetch sample without storing
 """
 
 import argparse
+import csv
 import sys
 
-from db import get_connection, init_db, get_email_count, get_sync_state
+from db import (
+    get_connection, init_db, get_email_count, get_sync_state,
+    has_sender_stats, sender_like_clause
+)
+from imap_client import DEFAULT_FETCH_CONCURRENCY
+
+
+def format_sender_rows(rows) -> str:
+    """Fixed-width Sender / Count / Size (MB) table body, one line per row."""
+    return "".join(
+        f"{row['sender_email'][:44]:<45} {row['count']:>8} {row['size_mb']:>10.2f}\n"
+        for row in rows
+    )
+
+
+def write_csv(header: list[str], rows) -> None:
+    """Write `header` and `rows` to stdout as CSV (for --csv)."""
+    writer = csv.writer(sys.stdout, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
 
 
 def cmd_fetch(args):
@@ -47,7 +68,8 @@ def cmd_fetch(args):
 
     stats = fetch_all(
         batch_size=args.batch_size,
-        incremental=incremental
+        incremental=incremental,
+        concurrency=args.concurrency
     )
 
     print(f"\n{'='*40}")
@@ -55,6 +77,7 @@ def cmd_fetch(args):
     print(f"  Total fetched: {stats['total_fetched']}")
     print(f"  New stored: {stats['new_stored']}")
     print(f"  Already existed: {stats['already_existed']}")
+    print(f"  Previously deleted: {stats['previously_deleted']}")
     print(f"  Errors: {stats['errors']}")
     print(f"{'='*40}")
 
@@ -62,7 +85,7 @@ def cmd_fetch(args):
 def cmd_stats(args):
     """Show database statistics."""
     init_db()
-    conn = get_connection()
+    conn = get_connection(read_only=True)
 
     count = get_email_count(conn)
     sync = get_sync_state(conn)
@@ -96,7 +119,7 @@ def cmd_stats(args):
 def cmd_query(args):
     """Run ad-hoc SQL query."""
     init_db()
-    conn = get_connection()
+    conn = get_connection(read_only=True)
 
     query = args.sql
 
@@ -111,13 +134,14 @@ def cmd_query(args):
         # Get column names
         columns = [desc[0] for desc in cursor.description]
 
-        # Print header
+        if args.csv:
+            write_csv(columns, rows)
+            return
+
+        # Header, then all rows in a single write
         print("\t".join(columns))
         print("-" * 80)
-
-        # Print rows
-        for row in rows:
-            print("\t".join(str(row[col]) for col in columns))
+        sys.stdout.write("".join("\t".join(map(str, row)) + "\n" for row in rows))
 
         print(f"\n({len(rows)} rows)")
 
@@ -131,103 +155,119 @@ def cmd_query(args):
 def cmd_top_senders(args):
     """Show top senders by count and size."""
     init_db()
-    conn = get_connection()
+    conn = get_connection(read_only=True)
 
     limit = args.limit
 
-    print(f"\n{'='*70}")
-    print(f"Top {limit} Senders by Email Count")
-    print(f"{'='*70}")
-
-    rows = conn.execute("""
-        SELECT
-            sender_email,
-            COUNT(*) as count,
-            SUM(size_bytes) / 1024.0 / 1024.0 as size_mb
-        FROM emails
-        WHERE sender_email != ''
-        GROUP BY sender_email
-        ORDER BY count DESC
-        LIMIT ?
-    """, (limit,)).fetchall()
-
-    print(f"{'Sender':<45} {'Count':>8} {'Size (MB)':>10}")
-    print("-" * 70)
-
-    for row in rows:
-        sender = row['sender_email'][:44]
-        print(f"{sender:<45} {row['count']:>8} {row['size_mb']:>10.2f}")
-
-    print(f"\n{'='*70}")
-    print(f"Top {limit} Senders by Total Size")
-    print(f"{'='*70}")
+    # Per-sender totals: the trigger-maintained summary table if it is
+    # current, otherwise aggregate the emails table directly. --by-domain
+    # groups on sender_domain instead (covered by idx_sender_domain); the
+    # domain goes in the sender_email column so the output code is shared
+    label = "Domains" if args.by_domain else "Senders"
+    if args.by_domain:
+        totals = """
+            SELECT sender_domain as sender_email, COUNT(*) as count, SUM(size_bytes) as total_size
+            FROM emails
+            WHERE sender_domain != ''
+            GROUP BY sender_domain
+        """
+    elif has_sender_stats(conn):
+        totals = "SELECT sender_email, count, total_size FROM sender_stats"
+    else:
+        totals = """
+            SELECT sender_email, COUNT(*) as count, SUM(size_bytes) as total_size
+            FROM emails
+            WHERE sender_email != ''
+            GROUP BY sender_email
+        """
 
-    rows = conn.execute("""
-        SELECT
-            sender_email,
-            COUNT(*) as count,
-            SUM(size_bytes) / 1024.0 / 1024.0 as size_mb
-        FROM emails
-        WHERE sender_email != ''
-        GROUP BY sender_email
-        ORDER BY size_mb DESC
-        LIMIT ?
-    """, (limit,)).fetchall()
+    # Aggregate once; both rankings read the same CTE (a temp table would
+    # be a write on this read-only connection)
+    rows = conn.execute(f"""
+        WITH _top AS ({totals})
+        SELECT * FROM (
+            SELECT 'count' as ranking, sender_email, count,
+                   total_size / 1024.0 / 1024.0 as size_mb
+            FROM _top
+            ORDER BY count DESC
+            LIMIT ?
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT 'size' as ranking, sender_email, count,
+                   total_size / 1024.0 / 1024.0 as size_mb
+            FROM _top
+            ORDER BY size_mb DESC
+            LIMIT ?
+        )
+    """, (limit, limit)).fetchall()
+
+    by_count = [row for row in rows if row["ranking"] == "count"]
+    by_size = [row for row in rows if row["ranking"] == "size"]
+
+    if args.csv:
+        write_csv(
+            ["ranking", "sender_domain" if args.by_domain else "sender_email", "count", "size_mb"],
+            rows
+        )
+    else:
+        for title, ranked in (("Email Count", by_count), ("Total Size", by_size)):
+            sys.stdout.write(
+                f"\n{'='*70}\n"
+                f"Top {limit} {label} by {title}\n"
+                f"{'='*70}\n"
+                f"{label[:-1]:<45} {'Count':>8} {'Size (MB)':>10}\n"
+                f"{'-' * 70}\n"
+                + format_sender_rows(ranked)
+            )
 
-    print(f"{'Sender':<45} {'Count':>8} {'Size (MB)':>10}")
-    print("-" * 70)
+    conn.close()
 
-    for row in rows:
-        sender = row['sender_email'][:44]
-        print(f"{sender:<45} {row['count']:>8} {row['size_mb']:>10.2f}")
 
-    conn.close()
+# sender_email LIKE patterns for likely newsletter / automated senders
+NEWSLETTER_PATTERNS = [
+    "%noreply%", "%no-reply%", "%newsletter%", "%notifications%",
+    "%updates%", "%mailer%", "mail@%", "info@%", "news@%",
+]
 
 
 def cmd_newsletters(args):
     """Show likely newsletter senders."""
     init_db()
-    conn = get_connection()
+    conn = get_connection(read_only=True)
 
-    print(f"\n{'='*70}")
-    print("Likely Newsletter / Automated Senders")
-    print(f"{'='*70}")
+    conditions, params = sender_like_clause(conn, NEWSLETTER_PATTERNS)
 
-    rows = conn.execute("""
+    rows = conn.execute(f"""
         SELECT
             sender_email,
             COUNT(*) as count,
             SUM(size_bytes) / 1024.0 / 1024.0 as size_mb
         FROM emails
-        WHERE
-            sender_email LIKE '%noreply%'
-            OR sender_email LIKE '%no-reply%'
-            OR sender_email LIKE '%newsletter%'
-            OR sender_email LIKE '%notifications%'
-            OR sender_email LIKE '%updates%'
-            OR sender_email LIKE '%mailer%'
-            OR sender_email LIKE 'mail@%'
-            OR sender_email LIKE 'info@%'
-            OR sender_email LIKE 'news@%'
+        WHERE {conditions}
         GROUP BY sender_email
         ORDER BY count DESC
         LIMIT 30
-    """).fetchall()
-
-    total_count = 0
-    total_size = 0
-
-    print(f"{'Sender':<45} {'Count':>8} {'Size (MB)':>10}")
-    print("-" * 70)
+    """, params).fetchall()
 
-    for row in rows:
-        sender = row['sender_email'][:44]
-        print(f"{sender:<45} {row['count']:>8} {row['size_mb']:>10.2f}")
-        total_count += row['count']
-        total_size += row['size_mb']
+    if args.csv:
+        write_csv(["sender_email", "count", "size_mb"], rows)
+        conn.close()
+        return
 
-    print("-" * 70)
-    print(f"{'TOTAL':<45} {total_count:>8} {total_size:>10.2f}")
+    total_count = sum(row['count'] for row in rows)
+    total_size = sum(row['size_mb'] for row in rows)
+
+    sys.stdout.write(
+        f"\n{'='*70}\n"
+        "Likely Newsletter / Automated Senders\n"
+        f"{'='*70}\n"
+        f"{'Sender':<45} {'Count':>8} {'Size (MB)':>10}\n"
+        f"{'-' * 70}\n"
+        + format_sender_rows(rows)
+        + f"{'-' * 70}\n"
+        f"{'TOTAL':<45} {total_count:>8} {total_size:>10.2f}\n"
+    )
 
     conn.close()
 
@@ -247,22 +287,29 @@ def cmd_cleanup(args):
 
     patterns = args.patterns
 
-    # Build WHERE clause for all patterns
-    conditions = " OR ".join(["sender_email LIKE ?" for _ in patterns])
-    like_patterns = [f"%{p}%" for p in patterns]
+    # Build WHERE clause for all patterns (FTS-assisted when possible)
+    conditions, params = sender_like_clause(conn, [f"%{p}%" for p in patterns])
+
+    # Materialize the matches once; the listing and the per-sender summary
+    # both read this temp table (dropped when the connection closes)
+    conn.execute(f"""
+        CREATE TEMP TABLE _matches AS
+        SELECT uid, sender_email, subject, date_parsed, size_bytes
+        FROM emails
+        WHERE {conditions}
+    """, params)
 
     # Get matching emails
-    rows = conn.execute(f"""
+    rows = conn.execute("""
         SELECT
             uid,
             sender_email,
             subject,
             date_parsed,
             size_bytes
-        FROM emails
-        WHERE {conditions}
+        FROM _matches
         ORDER BY date_parsed DESC
-    """, like_patterns).fetchall()
+    """).fetchall()
 
     if not rows:
         print(f"No emails found matching patterns: {patterns}")
@@ -270,16 +317,15 @@ def cmd_cleanup(args):
         return
 
     # Group by sender for summary
-    sender_stats = conn.execute(f"""
+    sender_stats = conn.execute("""
         SELECT
             sender_email,
             COUNT(*) as count,
             SUM(size_bytes) / 1024.0 / 1024.0 as size_mb
-        FROM emails
-        WHERE {conditions}
+        FROM _matches
         GROUP BY sender_email
         ORDER BY count DESC
-    """, like_patterns).fetchall()
+    """).fetchall()
 
     total_count = len(rows)
     total_size = sum(r['size_bytes'] for r in rows) / 1024 / 1024
@@ -290,9 +336,7 @@ def cmd_cleanup(args):
     print(f"{'Sender':<45} {'Count':>8} {'Size (MB)':>10}")
     print("-" * 70)
 
-    for row in sender_stats:
-        sender = row['sender_email'][:44]
-        print(f"{sender:<45} {row['count']:>8} {row['size_mb']:>10.2f}")
+    sys.stdout.write(format_sender_rows(sender_stats))
 
     print("-" * 70)
     print(f"{'TOTAL':<45} {total_count:>8} {total_size:>10.2f}")
@@ -365,7 +409,7 @@ Examples:
      python main.py newsletters
 
   4. Run custom SQL:
-     python main.py query "SELECT COUNT(*) FROM emails WHERE sender_email LIKE '%@github.com'"
+     python main.py query "SELECT COUNT(*) FROM emails WHERE sender_domain = 'github.com'"
 
   5. Delete emails (see delete.py --help for details):
      python delete.py --file uids.txt
@@ -378,6 +422,10 @@ Examples:
     fetch_parser = subparsers.add_parser("fetch", help="Fetch emails from Gmail")
     fetch_parser.add_argument("--full", action="store_true", help="Full re-fetch (ignore sync state)")
     fetch_parser.add_argument("--batch-size", type=int, default=100, help="Batch size (default: 100)")
+    fetch_parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_FETCH_CONCURRENCY,
+        help=f"Parallel IMAP sessions, needs aioimaplib (default: {DEFAULT_FETCH_CONCURRENCY})"
+    )
     fetch_parser.add_argument("--sample", type=int, metavar="N", help="Just fetch N recent emails without storing")
     fetch_parser.set_defaults(func=cmd_fetch)
 
@@ -386,17 +434,21 @@ Examples:
     stats_parser.set_defaults(func=cmd_stats)
 
     # query command
-    query_parser = subparsers.add_parser("query", help="Run SQL query")
+    query_parser = subparsers.add_parser("query", help="Run read-only SQL query")
     query_parser.add_argument("sql", help="SQL query to execute")
+    query_parser.add_argument("--csv", action="store_true", help="Output as CSV")
     query_parser.set_defaults(func=cmd_query)
 
     # top-senders command
     senders_parser = subparsers.add_parser("top-senders", help="Show top email senders")
     senders_parser.add_argument("--limit", type=int, default=20, help="Number of senders to show")
+    senders_parser.add_argument("--by-domain", action="store_true", help="Group by sender domain")
+    senders_parser.add_argument("--csv", action="store_true", help="Output as CSV")
     senders_parser.set_defaults(func=cmd_top_senders)
 
     # newsletters command
     news_parser = subparsers.add_parser("newsletters", help="Show likely newsletter senders")
+    news_parser.add_argument("--csv", action="store_true", help="Output as CSV")
     news_parser.set_defaults(func=cmd_newsletters)
 
     # cleanup command
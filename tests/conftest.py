@@ -0,0 +1,167 @@
+"""
+Shared fixtures: a minimal in-process IMAP server.
+
+FakeIMAPServer speaks just enough IMAP4rev1 for GmailIMAPClient (imaplib)
+and the pipelined fetch (aioimaplib), over plain TCP - the fixture swaps
+both libraries' IMAP4_SSL for their plain IMAP4 classes. Like Gmail, it
+only advertises UIDPLUS / ENABLE / CONDSTORE / QRESYNC after LOGIN.
+"""
+
+import imaplib
+import socketserver
+import threading
+
+import pytest
+
+from imap_client import GMAIL_ALL_MAIL, IMAPConfig, parse_uid_set
+
+PRE_AUTH_CAPABILITIES = "IMAP4rev1 AUTH=PLAIN"
+POST_AUTH_CAPABILITIES = "IMAP4rev1 UIDPLUS ENABLE CONDSTORE QRESYNC"
+
+UIDVALIDITY = 7
+HIGHESTMODSEQ = 100
+
+
+def make_headers(uid: int) -> bytes:
+    return (
+        f"From: Sender {uid} <sender{uid}@example.com>\r\n"
+        f"Subject: Message {uid}\r\n"
+        "Date: Mon, 1 Jan 2024 12:00:00 +0000\r\n"
+        f"Message-ID: <{uid}@example.com>\r\n\r\n"
+    ).encode()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One IMAP session; every command line is appended to server.commands."""
+
+    def handle(self) -> None:
+        server = self.server
+        self.authenticated = False
+        self.selected = False
+        self.send(f"* OK [CAPABILITY {PRE_AUTH_CAPABILITIES}] Fake IMAP ready")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode().rstrip("\r\n").partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            with server.lock:
+                server.commands.append(rest)
+
+            if command == "CAPABILITY":
+                caps = POST_AUTH_CAPABILITIES if self.authenticated else PRE_AUTH_CAPABILITIES
+                self.send(f"* CAPABILITY {caps}")
+                self.send(f"{tag} OK CAPABILITY completed")
+            elif command == "LOGIN":
+                self.authenticated = True
+                self.send(f"{tag} OK authenticated")
+            elif command == "ENABLE":
+                self.send(f"* ENABLED {args}")
+                self.send(f"{tag} OK ENABLE completed")
+            elif command in ("SELECT", "EXAMINE"):
+                if not args.startswith(f'"{GMAIL_ALL_MAIL}"'):
+                    self.send(f"{tag} NO no such mailbox")
+                    continue
+                self.selected = True
+                uids = server.uids
+                self.send(f"* {len(uids)} EXISTS")
+                self.send(f"* OK [UIDVALIDITY {UIDVALIDITY}] UIDs valid")
+                self.send(f"* OK [UIDNEXT {max(uids, default=0) + 1}] next UID")
+                self.send(f"* OK [HIGHESTMODSEQ {HIGHESTMODSEQ}] modseq")
+                if "(QRESYNC" in args and server.vanished:
+                    self.send(f"* VANISHED (EARLIER) {server.vanished}")
+                mode = "READ-ONLY" if command == "EXAMINE" else "READ-WRITE"
+                self.send(f"{tag} OK [{mode}] {command} completed")
+            elif command == "UID" and self.selected:
+                self.handle_uid(tag, args)
+            elif command == "UID":
+                self.send(f"{tag} BAD no mailbox selected")
+            elif command in ("NOOP", "EXPUNGE", "CLOSE"):
+                if command == "CLOSE":
+                    self.selected = False
+                self.send(f"{tag} OK {command} completed")
+            elif command == "LOGOUT":
+                self.send("* BYE logging out")
+                self.send(f"{tag} OK LOGOUT completed")
+                return
+            else:
+                self.send(f"{tag} BAD unknown command")
+
+    def handle_uid(self, tag: str, args: str) -> None:
+        subcommand, _, args = args.partition(" ")
+        subcommand = subcommand.upper()
+        uid_set = args.split(" ")[0]
+
+        if subcommand == "FETCH":
+            wanted = set(parse_uid_set(uid_set))
+            for seq, uid in enumerate(self.server.uids, 1):
+                if uid not in wanted:
+                    continue
+                headers = make_headers(uid)
+                self.wfile.write(
+                    f'* {seq} FETCH (UID {uid} RFC822.SIZE {uid * 10} '
+                    f'INTERNALDATE "01-Jan-2024 12:00:00 +0000" '
+                    f'BODY[HEADER.FIELDS (FROM TO SUBJECT DATE MESSAGE-ID)] '
+                    f'{{{len(headers)}}}\r\n'.encode()
+                    + headers + b")\r\n"
+                )
+            self.send(f"{tag} OK FETCH completed")
+        elif subcommand in ("STORE", "EXPUNGE"):
+            self.send(f"{tag} OK {subcommand} completed")
+        else:
+            self.send(f"{tag} BAD unsupported UID command")
+
+    def send(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, uids: list[int]):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.uids = uids
+        self.vanished = ""  # UID set reported to a QRESYNC EXAMINE
+        self.commands: list[str] = []
+        self.lock = threading.Lock()
+
+    def count(self, command: str) -> int:
+        """Number of received command lines starting with `command`."""
+        with self.lock:
+            return sum(line.upper().startswith(command) for line in self.commands)
+
+
+@pytest.fixture
+def imap_server(monkeypatch):
+    """Running FakeIMAPServer holding UIDs 1..250, with SSL patched out."""
+    server = FakeIMAPServer(list(range(1, 251)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(
+        imaplib, "IMAP4_SSL",
+        lambda host, port, ssl_context=None: imaplib.IMAP4(host, port)
+    )
+    try:
+        import aioimaplib
+    except ImportError:
+        pass  # Optional dependency - only the pipelined tests need it
+    else:
+        monkeypatch.setattr(
+            aioimaplib, "IMAP4_SSL",
+            lambda host, port, ssl_context=None: aioimaplib.IMAP4(host=host, port=port)
+        )
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def imap_config(imap_server) -> IMAPConfig:
+    host, port = imap_server.server_address
+    return IMAPConfig(email="me@example.com", app_password="secret", host=host, port=port)
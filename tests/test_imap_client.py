@@ -0,0 +1,76 @@
+"""GmailIMAPClient against the in-process FakeIMAPServer (see conftest.py)."""
+
+import threading
+import time
+
+import pytest
+
+from imap_client import GmailIMAPClient
+
+
+def _fetch_threads() -> list[threading.Thread]:
+    return [t for t in threading.enumerate() if t.name == "imap-fetch"]
+
+
+def test_pipelined_fetch_returns_every_uid(imap_server, imap_config):
+    pytest.importorskip("aioimaplib")
+    client = GmailIMAPClient(imap_config)
+
+    fetched = {}
+    for batch in client.fetch_headers_batch(
+        list(range(1, 251)), batch_size=50, delay_seconds=0, concurrency=4
+    ):
+        fetched.update(batch)
+
+    assert sorted(fetched) == list(range(1, 251))
+    assert fetched[42]["size"] == 420
+    assert fetched[42]["internaldate"] == "01-Jan-2024 12:00:00 +0000"
+    assert b"Subject: Message 42" in fetched[42]["headers"]
+    # Each session selects All Mail and is logged out at the end
+    assert imap_server.count("SELECT") == 4
+    assert imap_server.count("LOGOUT") == 4
+
+
+def test_abandoned_pipelined_fetch_stops_its_thread(imap_server, imap_config):
+    pytest.importorskip("aioimaplib")
+    client = GmailIMAPClient(imap_config)
+
+    batches = client.fetch_headers_batch(
+        list(range(1, 251)), batch_size=10, delay_seconds=0, concurrency=4
+    )
+    next(batches)
+    batches.close()
+
+    deadline = time.monotonic() + 5
+    while _fetch_threads() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not _fetch_threads()
+    assert imap_server.count("LOGOUT") == imap_server.count("LOGIN")
+
+
+def test_delete_uses_uid_expunge_with_post_login_uidplus(imap_server, imap_config):
+    client = GmailIMAPClient(imap_config)
+    client.connect()
+    try:
+        assert client.supports_uidplus
+        assert client.delete_messages([3, 4, 5]) == 3
+    finally:
+        client.disconnect()
+
+    assert imap_server.count("UID EXPUNGE 3:5") == 1
+    assert imap_server.count("EXPUNGE") == 0
+
+
+def test_connect_enables_qresync_advertised_after_login(imap_server, imap_config):
+    imap_server.vanished = "41,43:45"
+    client = GmailIMAPClient(imap_config)
+    client.connect()
+    try:
+        assert client.supports_qresync
+        assert client.highest_modseq == 100
+        assert client.uidvalidity == 7
+        assert client.qresync_vanished(7, 90) == [41, 43, 44, 45]
+    finally:
+        client.disconnect()
+
+    assert imap_server.count("ENABLE QRESYNC") == 1